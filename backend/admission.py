@@ -0,0 +1,303 @@
+# backend/admission.py
+"""
+Contrôle d'admission devant les routes d'inférence (/predict, /recommend…).
+
+- au plus ADMISSION_MAX_CONCURRENT inférences en parallèle
+- file d'attente FIFO bornée (ADMISSION_MAX_QUEUE)
+- échéance par requête : en-tête `X-Request-Deadline-Ms` (plafonné à
+  ADMISSION_DEADLINE_MS) ou ADMISSION_DEADLINE_MS ; une requête qui ne peut plus finir à temps
+  (attente estimée + durée moyenne d'inférence) est rejetée tout de suite
+  en 503 avec Retry-After, au lieu de ralentir toutes les autres
+- la durée d'inférence estimée (EWMA) ignore les requêtes qui ont dû
+  charger ou entraîner des modèles (démarrage à froid) ; tant qu'elle ne
+  repose pas sur WARM_SAMPLES mesures, aucune requête n'est rejetée sur
+  l'échéance
+- les routes légères (/health, /formations, /stats…) ne passent pas par
+  ce contrôle : elles restent servies même quand l'inférence sature
+
+ADMISSION_ENABLED=0 désactive le contrôle. Compteurs : GET /admission/stats.
+
+    python admission.py   → test de charge avec / sans contrôle d'admission
+"""
+import functools
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from flask import jsonify, request
+
+from registry import thread_load_seconds
+
+EWMA_ALPHA = 0.2
+# mesures « à chaud » nécessaires avant de rejeter sur l'échéance
+WARM_SAMPLES = 3
+# une mesure isolée ne peut pas dépasser SAMPLE_CAP × l'estimation courante
+SAMPLE_CAP = 4.0
+
+
+class AdmissionController:
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int,
+                 deadline_ms: float, enabled: bool = True):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.deadline = deadline_ms / 1000
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._waiters = deque()
+        self._service = {}  # durée moyenne (EWMA, secondes) par endpoint
+        self._service_all = None
+        self._samples = 0
+        self.counters = Counter()
+
+    @classmethod
+    def from_env(cls, name: str) -> "AdmissionController":
+        max_concurrent = int(os.environ.get("ADMISSION_MAX_CONCURRENT", os.cpu_count() or 2))
+        return cls(
+            name,
+            max_concurrent=max_concurrent,
+            max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", 32 * max_concurrent)),
+            deadline_ms=float(os.environ.get("ADMISSION_DEADLINE_MS", 2000)),
+            enabled=os.environ.get("ADMISSION_ENABLED", "1") not in ("0", "false", ""),
+        )
+
+    # ------------------------------------------------------------
+    # Estimations
+    # ------------------------------------------------------------
+
+    def _estimated_finish(self, endpoint: str, queued: int) -> float:
+        """Temps estimé avant la fin de la requête si elle rejoint la file maintenant."""
+        if self._samples < WARM_SAMPLES:
+            return 0.0
+        own = self._service.get(endpoint, self._service_all)
+        return (queued + 1) / self.max_concurrent * self._service_all + own
+
+    def _retry_after(self) -> int:
+        service = self._service_all or 1.0
+        return max(1, math.ceil((len(self._waiters) / self.max_concurrent + 1) * service))
+
+    # ------------------------------------------------------------
+    # Admission / libération
+    # ------------------------------------------------------------
+
+    def acquire(self, endpoint: str, deadline: float):
+        """
+        Retourne (None, None) si la requête est admise, sinon (raison, retry_after).
+        `deadline` est une date absolue time.monotonic().
+        """
+        now = time.monotonic()
+        if not math.isfinite(deadline):
+            deadline = now + self.deadline
+        with self._lock:
+            if self._inflight < self.max_concurrent and not self._waiters:
+                self._inflight += 1
+                self.counters["admitted"] += 1
+                return None, None
+            if len(self._waiters) >= self.max_queue:
+                self.counters["shed_queue_full"] += 1
+                return "queue_full", self._retry_after()
+            if now + self._estimated_finish(endpoint, len(self._waiters)) > deadline:
+                self.counters["shed_deadline"] += 1
+                return "deadline", self._retry_after()
+            ticket = threading.Event()
+            self._waiters.append(ticket)
+            own = self._service.get(endpoint, self._service_all or 0.0)
+
+        try:
+            # on attend au plus jusqu'au dernier instant où l'on peut encore finir à temps
+            ticket.wait(timeout=max(deadline - own - time.monotonic(), 0))
+        except BaseException:
+            # attente interrompue : ni ticket mort dans la file, ni créneau perdu
+            with self._lock:
+                if ticket.is_set():
+                    self._hand_off()
+                else:
+                    self._waiters.remove(ticket)
+            raise
+        with self._lock:
+            if ticket.is_set():
+                self.counters["admitted"] += 1
+                return None, None
+            self._waiters.remove(ticket)
+            self.counters["shed_timeout"] += 1
+            return "timeout", self._retry_after()
+
+    def release(self, endpoint: str, duration: float, cold: bool = False):
+        """
+        Libère le créneau. `cold` : la requête a chargé / entraîné des modèles,
+        sa durée n'est pas représentative et n'entre pas dans l'estimation.
+        """
+        with self._lock:
+            if cold:
+                self.counters["cold_samples"] += 1
+            else:
+                self._service[endpoint] = _ewma(self._service.get(endpoint), duration)
+                self._service_all = _ewma(self._service_all, duration)
+                self._samples += 1
+            self.counters["completed"] += 1
+            self._hand_off()
+
+    def _hand_off(self):
+        """Libère un créneau (appelé sous self._lock)."""
+        if self._waiters:
+            # le créneau passe directement au premier de la file
+            self._waiters.popleft().set()
+        else:
+            self._inflight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "deadline_ms": round(self.deadline * 1000),
+                "in_flight": self._inflight,
+                "queue_depth": len(self._waiters),
+                "service_ms": {k: round(v * 1000, 1) for k, v in self._service.items()},
+                **{k: self.counters.get(k, 0) for k in (
+                    "admitted", "completed", "cold_samples",
+                    "shed_queue_full", "shed_deadline", "shed_timeout",
+                )},
+            }
+
+    # ------------------------------------------------------------
+    # Intégration Flask
+    # ------------------------------------------------------------
+
+    def _request_deadline(self) -> float:
+        """Échéance absolue ; l'en-tête ne peut que raccourcir le budget par défaut."""
+        header = request.headers.get("X-Request-Deadline-Ms")
+        try:
+            budget = float(header) / 1000 if header else self.deadline
+        except ValueError:
+            budget = self.deadline
+        if not math.isfinite(budget) or budget <= 0:
+            budget = self.deadline
+        return time.monotonic() + min(budget, self.deadline)
+
+    def guard(self, func):
+        """Décorateur pour une route d'inférence (à placer sous @app.route)."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            endpoint = request.endpoint or func.__name__
+            reason, retry_after = self.acquire(endpoint, self._request_deadline())
+            if reason is not None:
+                resp = jsonify({"error": "Serveur saturé, réessayez plus tard.", "reason": reason})
+                resp.status_code = 503
+                resp.headers["Retry-After"] = str(retry_after)
+                return resp
+            t0 = time.monotonic()
+            loading = thread_load_seconds()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.release(endpoint, time.monotonic() - t0,
+                             cold=thread_load_seconds() > loading)
+        return wrapper
+
+
+def _ewma(prev: Optional[float], sample: float) -> float:
+    if prev is None:
+        return sample
+    return EWMA_ALPHA * min(sample, SAMPLE_CAP * prev) + (1 - EWMA_ALPHA) * prev
+
+
+def init_admission(app, controller: Optional[AdmissionController] = None) -> AdmissionController:
+    """Crée le contrôleur de l'app et expose ses compteurs sur /admission/stats."""
+    controller = controller or AdmissionController.from_env(app.name)
+
+    @app.route("/admission/stats", methods=["GET"])
+    def admission_stats():
+        return jsonify(controller.stats())
+
+    return controller
+
+
+# ============================================================
+# Test de charge : rafale sur /recommend, avec et sans contrôle
+# ============================================================
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def load_test(clients=48, requests_per_client=4, deadline_ms=1000):
+    import json
+    import logging
+    import urllib.error
+    import urllib.request
+    from werkzeug.serving import make_server
+
+    from rania import app, admission
+    from recommender import _ensure_models
+
+    _ensure_models()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/recommend"
+    body = json.dumps({"math_score": 12, "physics_score": 11, "communication": 6}).encode()
+
+    def one_run():
+        results = []
+        lock = threading.Lock()
+
+        def client():
+            for _ in range(requests_per_client):
+                req = urllib.request.Request(url, data=body, headers={
+                    "Content-Type": "application/json",
+                    "X-Request-Deadline-Ms": str(deadline_ms),
+                })
+                t0 = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(req, timeout=60) as r:
+                        r.read()
+                        status = r.status
+                except urllib.error.HTTPError as e:
+                    status = e.code
+                with lock:
+                    results.append((status, (time.perf_counter() - t0) * 1000))
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        ok = [ms for s, ms in results if s == 200]
+        return {
+            "requests": len(results),
+            "ok": len(ok),
+            "shed_503": sum(1 for s, _ in results if s == 503),
+            "ok_within_deadline": sum(1 for ms in ok if ms <= deadline_ms),
+            "p50_ms": round(_percentile(ok, 0.50) or 0),
+            "p95_ms": round(_percentile(ok, 0.95) or 0),
+            "p99_ms": round(_percentile(ok, 0.99) or 0),
+            "wall_s": round(wall, 2),
+        }
+
+    # chauffe : alimente l'estimation de durée d'inférence
+    admission.enabled = True
+    urllib.request.urlopen(urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})).read()
+
+    for enabled in (False, True):
+        admission.enabled = enabled
+        print(f"admission {'ON ' if enabled else 'OFF'} :", one_run())
+    print("stats :", admission.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    load_test()
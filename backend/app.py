@@ -3,21 +3,35 @@ from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
 from datetime import datetime
 
-from ml_logic import predict_student
+from ml_logic import predict_student, predict_satisfaction
+from registry import normalize_centre
+from profiling import init_profiling
+from admission import init_admission
 
 app = Flask(__name__, template_folder="templates")
 CORS(app)
+init_profiling(app)
+admission = init_admission(app)
 
 # Mémoire en RAM pour les prédictions (pour le dashboard)
 PREDICTIONS_LOG = []
 
 
+def request_centre(data=None):
+    """Centre demandé : ?centre=<id> ou champ "centre" du JSON (défaut : dataset historique)."""
+    centre = request.args.get("centre")
+    if not centre and isinstance(data, dict):
+        centre = data.get("centre")
+    return normalize_centre(centre)
+
+
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({"status": "ok"})
 
 
 @app.route("/predict", methods=["POST"])
+@admission.guard
 def predict():
     """
     Reçoit un JSON du frontend, appelle le modèle
@@ -28,11 +42,13 @@ def predict():
         return jsonify({"error": "JSON body required"}), 400
 
     try:
-        result = predict_student(data)
+        centre = request_centre(data)
+        result = predict_student(data, centre)
 
         # enrichir pour l'admin (on garde aussi une partie des inputs)
         log_entry = {
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "centre": centre,
             "age": data.get("age"),
             "gender": data.get("gender"),
             "region": data.get("region"),
@@ -59,6 +75,40 @@ def predict():
 
         return jsonify(result)
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/predict_satisfaction", methods=["POST"])
+@admission.guard
+def predict_satisfaction_route():
+    """
+    Prédit la satisfaction d'un étudiant (objet JSON) ou d'un batch
+    (liste JSON ou {"students": [...]}) en un seul passage du modèle.
+    """
+    data = request.get_json()
+    if data is None:
+        return jsonify({"error": "JSON body required"}), 400
+
+    single = isinstance(data, dict) and "students" not in data
+    records = [data] if single else (data["students"] if isinstance(data, dict) else data)
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return jsonify({"error": "expected an object or a list of objects"}), 400
+
+    try:
+        preds = predict_satisfaction(records, request_centre(data))
+        if single:
+            return jsonify({"satisfaction": preds[0]})
+        return jsonify({"predictions": preds, "count": len(preds)})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,198 @@
+# backend/bulk_scoring.py
+"""
+Scoring hors-ligne de tous les étudiants connus du dataset.
+
+Les résultats (option recommandée, probabilités, cluster, étudiants
+similaires…) sont écrits dans une base SQLite indexée par student_id,
+ce qui permet à /recommend/<student_id> de répondre sans relancer les modèles.
+
+Le job est incrémental : les modèles sont ceux sauvegardés dans models/
+(voir recommender._ensure_models) et ne changent pas quand le CSV change ;
+seules les lignes nouvelles ou modifiées depuis le dernier passage sont
+re-scorées. --retrain ré-entraîne les modèles sur le CSV actuel (nouvelle
+version, donc tout est re-scoré) ; --full re-score tout sans ré-entraîner
+(rafraîchit aussi les étudiants similaires des lignes inchangées).
+
+    python bulk_scoring.py [--full] [--retrain] [--centre=<id>]
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+
+from recommender import (
+    _ensure_models,
+    PARCOURS,
+    retrain_models,
+    top_feature_explanations,
+)
+from registry import DEFAULT_CENTRE, normalize_centre
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "models", "recommendations.sqlite")
+
+N_SIMILAR = 10
+CHUNK_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recommendations (
+    student_id TEXT PRIMARY KEY,
+    row_hash TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    recommended_option TEXT,
+    cluster TEXT,
+    payload TEXT NOT NULL,
+    scored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def db_path_for(centre: Optional[str] = None) -> str:
+    centre = normalize_centre(centre)
+    if centre == DEFAULT_CENTRE:
+        return DB_PATH
+    return os.path.join(BASE_DIR, "models", f"recommendations_{centre}.sqlite")
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _row_hashes(df: pd.DataFrame, columns) -> pd.Series:
+    return pd.util.hash_pandas_object(df[columns], index=False).astype(str)
+
+
+def _model_version(models: Dict) -> str:
+    """Version du modèle sauvegardé : ne change qu'à un ré-entraînement."""
+    return models['model_version']
+
+
+def run_bulk_scoring(centre: Optional[str] = None, full: bool = False, retrain: bool = False) -> Dict:
+    t0 = time.perf_counter()
+    models = retrain_models(centre) if retrain else _ensure_models(centre)
+    db_path = db_path_for(centre)
+    df = models['df']
+    feature_columns = models['feature_columns']
+    clf = models['classifier']
+    X_scaled = models['X_scaled']
+    classes = [str(c) for c in models['label_encoder'].classes_]
+    cluster_label_map = models['cluster_label_map']
+
+    # une ligne par student_id (la dernière occurrence l'emporte)
+    positions = pd.Series(np.arange(len(df)), index=df['student_id'].astype(str))
+    positions = positions[~positions.index.duplicated(keep='last')]
+    hashes = _row_hashes(df, feature_columns + ['preferred_option']).to_numpy()
+    version = _model_version(models)
+
+    conn = connect(db_path)
+    try:
+        stored = dict(conn.execute(
+            "SELECT student_id, row_hash FROM recommendations WHERE model_version = ?",
+            (version,)
+        ).fetchall()) if not full else {}
+
+        todo = [
+            (sid, pos) for sid, pos in positions.items()
+            if stored.get(sid) != hashes[pos]
+        ]
+        removed = conn.execute("SELECT student_id FROM recommendations").fetchall()
+        removed = [r[0] for r in removed if r[0] not in positions.index]
+
+        X_filled = df[feature_columns].fillna(models['feature_medians'])
+        student_ids = df['student_id'].fillna('').astype(str).to_numpy()
+        options = df['preferred_option'].fillna('').astype(str).to_numpy()
+        nn = NearestNeighbors(n_neighbors=min(N_SIMILAR, len(df))).fit(X_scaled)
+        now = time.time()
+
+        for start in range(0, len(todo), CHUNK_SIZE):
+            chunk = todo[start:start + CHUNK_SIZE]
+            idx = np.array([pos for _, pos in chunk])
+            batch = X_scaled[idx]
+            proba = clf.predict_proba(batch)
+            clusters = models['clusters'][idx]
+            _, neighbours = nn.kneighbors(batch)
+            values = X_filled.iloc[idx].to_dict('records')
+
+            rows = []
+            for j, (sid, pos) in enumerate(chunk):
+                best = int(np.argmax(proba[j]))
+                option = classes[best]
+                cluster = cluster_label_map.get(int(clusters[j]), str(clusters[j]))
+                payload = {
+                    'recommended_option': option,
+                    'recommended_courses': PARCOURS.get(option, ["Cours généraux"]),
+                    'option_probabilities': {
+                        classes[i]: round(float(proba[j][i] * 100), 2) for i in range(len(classes))
+                    },
+                    'cluster': cluster,
+                    'similar_students': [
+                        {'student_id': student_ids[n], 'preferred_option': options[n]}
+                        for n in neighbours[j]
+                    ],
+                    'explanations': {
+                        'top_features': top_feature_explanations(models, values[j])
+                    },
+                }
+                rows.append((sid, hashes[pos], version, option, cluster, json.dumps(payload), now))
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO recommendations "
+                "(student_id, row_hash, model_version, recommended_option, cluster, payload, scored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+        conn.executemany("DELETE FROM recommendations WHERE student_id = ?", [(r,) for r in removed])
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('model_version', ?)", (version,))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_run', ?)", (str(now),))
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        'centre': normalize_centre(centre),
+        'students': int(len(positions)),
+        'rescored': len(todo),
+        'removed': len(removed),
+        'model_version': version,
+        'seconds': round(time.perf_counter() - t0, 3),
+    }
+
+
+def get_stored_recommendation(student_id: str, centre: Optional[str] = None) -> Optional[Dict]:
+    """Lecture par clé primaire — aucun modèle n'est chargé."""
+    db_path = db_path_for(centre)
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT payload, scored_at FROM recommendations WHERE student_id = ?",
+            (student_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    result = json.loads(row[0])
+    result['student_id'] = student_id
+    result['scored_at'] = row[1]
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+    centre = next((a.split("=", 1)[1] for a in sys.argv[1:] if a.startswith("--centre=")), None)
+    print(run_bulk_scoring(centre, full="--full" in sys.argv, retrain="--retrain" in sys.argv))
@@ -0,0 +1,290 @@
+# backend/clustering.py
+"""
+Clustering K-Means commun à ml_logic.py et recommender.py.
+
+- Mini-batch + initialisation sur échantillon pour les gros datasets
+- Choix automatique de k (silhouette échantillonnée ou inertie),
+  candidats entraînés en parallèle, silhouettes calculées une à une
+- Numérotation des clusters stable d'un ré-entraînement à l'autre :
+  au premier entraînement cluster 0 = centre le plus faible, k-1 = le plus
+  fort ; ensuite les nouveaux centres sont appariés aux centres sauvegardés
+  (models/), donc un cluster retrouvé garde son numéro
+"""
+import os
+import time
+import tracemalloc
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn import config_context
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from scipy.optimize import linear_sum_assignment
+from sklearn.metrics import silhouette_score
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+# Au-delà de ce nombre de lignes on passe en MiniBatchKMeans
+MINIBATCH_THRESHOLD = 50_000
+# Taille de l'échantillon utilisé pour l'initialisation MiniBatch
+SAMPLE_SIZE = 10_000
+# Taille de l'échantillon pour la silhouette (coût quadratique)
+SILHOUETTE_SAMPLE = 5_000
+# Mémoire de travail (Mo) des calculs de distances par blocs de la silhouette
+SILHOUETTE_WORKING_MB = 64
+# Écart de silhouette en deçà duquel on préfère le plus petit k (stabilité)
+K_TOLERANCE = 0.02
+
+
+def _fit_one(X, k, random_state, minibatch, n_init, batch_size, sample_size, init=None):
+    if init is not None:
+        n_init = 1
+    else:
+        init = "k-means++"
+    if minibatch:
+        km = MiniBatchKMeans(
+            n_clusters=k,
+            init=init,
+            random_state=random_state,
+            n_init=n_init,
+            batch_size=batch_size,
+            init_size=min(len(X), max(3 * k, sample_size)),
+        )
+    else:
+        km = KMeans(n_clusters=k, init=init, random_state=random_state, n_init=n_init)
+    km.fit(X)
+    return km
+
+
+def _score_one(X, km, criterion, sample_idx):
+    if criterion == "inertia":
+        return float(km.inertia_)
+    Xs = X[sample_idx]
+    labels = km.predict(Xs)
+    if len(np.unique(labels)) < 2:
+        return -1.0
+    with config_context(working_memory=SILHOUETTE_WORKING_MB):
+        return float(silhouette_score(Xs, labels))
+
+
+def _match_reference(centers: np.ndarray, ref: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+    """
+    Ordre des nouveaux centres tel que chacun prenne le numéro du centre de
+    référence le plus proche (affectation hongroise sur les distances).
+    Les centres sans correspondant (k a augmenté) viennent ensuite, dans
+    l'ordre de `fallback` ; si k a diminué, les numéros restent dans
+    l'ordre des anciens et sont simplement recompactés.
+    """
+    cost = np.linalg.norm(centers[:, None, :] - ref[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    matched = rows[np.argsort(cols)]
+    taken = set(rows)
+    unmatched = [i for i in fallback if i not in taken]
+    return np.concatenate([matched, np.asarray(unmatched, dtype=int)]).astype(int)
+
+
+def _elbow(ks: List[int], inertias: List[float]) -> int:
+    """Coude de la courbe d'inertie : plus grande courbure (différence seconde)."""
+    if len(ks) < 3:
+        return ks[0]
+    curvature = np.diff(inertias, 2)
+    return ks[int(np.argmax(curvature)) + 1]
+
+
+def label_ranks(n_clusters: int, names: List[str]) -> Dict[int, str]:
+    """Répartit des libellés ordonnés ('faible' → 'excellent') sur k clusters ordonnés."""
+    if n_clusters == 1:
+        return {0: names[len(names) // 2]}
+    last = len(names) - 1
+    return {
+        i: names[int(np.floor(i * last / (n_clusters - 1) + 0.5))]
+        for i in range(n_clusters)
+    }
+
+
+def _reference_path(name: str) -> str:
+    return os.path.join(MODELS_DIR, f"centers_{name}.npy")
+
+
+def load_reference_centers(name: str) -> Optional[np.ndarray]:
+    """Centres du dernier entraînement (None s'il n'y en a pas)."""
+    path = _reference_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path)
+    except Exception as e:
+        print("⚠️ Centres de référence illisibles, entraînement à froid :", e)
+        return None
+
+
+def save_reference_centers(name: str, centers: np.ndarray):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    np.save(_reference_path(name), centers)
+
+
+class AutoKMeans:
+    """
+    K-Means à k automatique, utilisable comme un KMeans scikit-learn
+    (fit / predict / fit_predict / labels_ / cluster_centers_ / n_clusters).
+
+    En silhouette, le plus petit k dont le score est à moins de
+    `k_tolerance` du meilleur est retenu.
+
+    Avec `reference_centers` (centres d'un entraînement précédent), la
+    recherche de k a toujours lieu ; l'ancien k est conservé s'il reste à
+    moins de `k_tolerance` du meilleur score, et il repart des anciens
+    centres. Les centres retenus sont ensuite appariés aux anciens : un
+    cluster retrouvé garde son numéro. Avec `rank_by_strength`, si cet
+    appariement ne respecte plus l'ordre faible → fort (libellés ordonnés,
+    voir label_ranks), l'ordre par moyenne croissante est utilisé.
+
+    Après fit, `fit_report_` contient le temps d'entraînement, le pic
+    mémoire et le score de chaque k candidat.
+    """
+
+    def __init__(
+        self,
+        k_candidates: Iterable[int] = range(2, 8),
+        criterion: str = "silhouette",
+        random_state: int = 42,
+        n_init: int = 10,
+        batch_size: int = 4096,
+        minibatch_threshold: int = MINIBATCH_THRESHOLD,
+        sample_size: int = SAMPLE_SIZE,
+        n_jobs: Optional[int] = -1,
+        track_memory: bool = False,
+        k_tolerance: float = K_TOLERANCE,
+        reference_centers: Optional[np.ndarray] = None,
+        rank_by_strength: bool = False,
+    ):
+        if criterion not in ("silhouette", "inertia"):
+            raise ValueError("criterion doit valoir 'silhouette' ou 'inertia'")
+        self.k_candidates = sorted(set(int(k) for k in k_candidates))
+        self.criterion = criterion
+        self.random_state = random_state
+        self.n_init = n_init
+        self.batch_size = batch_size
+        self.minibatch_threshold = minibatch_threshold
+        self.sample_size = sample_size
+        self.n_jobs = n_jobs
+        self.track_memory = track_memory
+        self.k_tolerance = k_tolerance
+        self.reference_centers = reference_centers
+        self.rank_by_strength = rank_by_strength
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=float)
+        n = len(X)
+        ks = [k for k in self.k_candidates if 1 < k < n] or [min(2, n)]
+        minibatch = n > self.minibatch_threshold
+
+        ref = self.reference_centers
+        if ref is not None and (ref.ndim != 2 or ref.shape[1] != X.shape[1]):
+            ref = None  # features changées : les anciens centres ne veulent plus rien dire
+        ref_k = len(ref) if ref is not None else None
+
+        if self.track_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+
+        rng = np.random.RandomState(self.random_state)
+        sample_idx = rng.choice(n, size=min(n, SILHOUETTE_SAMPLE, self.sample_size), replace=False)
+
+        def run(k):
+            return _fit_one(
+                X, k, self.random_state, minibatch,
+                self.n_init, self.batch_size, self.sample_size,
+                init=ref if k == ref_k else None
+            )
+
+        if len(ks) == 1:
+            fitted = [run(ks[0])]
+        else:
+            # threads : KMeans libère le GIL dans ses boucles Cython
+            fitted = Parallel(n_jobs=self.n_jobs, prefer="threads")(
+                delayed(run)(k) for k in ks
+            )
+        # silhouettes une par une : en parallèle, chacune alloue ses propres
+        # blocs de distances et le pic mémoire est multiplié par le nombre de k
+        results = [(km, _score_one(X, km, self.criterion, sample_idx)) for km in fitted]
+        scores = [s for _, s in results]
+
+        if len(ks) == 1:
+            best = 0
+        elif self.criterion == "silhouette":
+            # plus petit k à moins de k_tolerance du meilleur score (l'ancien k
+            # s'il y est encore) : quand les silhouettes sont toutes proches,
+            # un ré-entraînement ne fait pas basculer k
+            top = max(scores)
+            near = [i for i, s in enumerate(scores) if s >= top - self.k_tolerance]
+            best = ks.index(ref_k) if ref_k in ks and ks.index(ref_k) in near else near[0]
+        else:
+            best = ks.index(_elbow(ks, scores))
+        km = results[best][0]
+
+        # numérotation canonique : tri des centres par moyenne croissante,
+        # puis appariement aux centres de référence s'il y en a
+        by_strength = np.argsort(km.cluster_centers_.mean(axis=1), kind="stable")
+        order, numbering = by_strength, "strength"
+        if ref is not None:
+            matched = _match_reference(km.cluster_centers_, ref, by_strength)
+            ranked = np.all(np.diff(km.cluster_centers_[matched].mean(axis=1)) > 0)
+            if ranked or not self.rank_by_strength:
+                order, numbering = matched, "reference"
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+
+        self.estimator_ = km
+        self.n_clusters = ks[best]
+        self.cluster_centers_ = km.cluster_centers_[order]
+        self.labels_ = remap[km.labels_]
+        self.inertia_ = float(km.inertia_)
+        self._remap = remap
+
+        elapsed = time.perf_counter() - t0
+        peak = None
+        if self.track_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.fit_report_ = {
+            "n_rows": n,
+            "algorithm": "minibatch" if minibatch else "lloyd",
+            "warm_start": ks[best] == ref_k,
+            "numbering": numbering,
+            "criterion": self.criterion,
+            "scores": {int(k): float(s) for k, s in zip(ks, scores)},
+            "n_clusters": int(self.n_clusters),
+            "fit_seconds": round(elapsed, 3),
+            "peak_memory_mb": round(peak / 1e6, 1) if peak is not None else None,
+        }
+        return self
+
+    def predict(self, X):
+        return self._remap[self.estimator_.predict(np.asarray(X, dtype=float))]
+
+    def fit_predict(self, X, y=None):
+        return self.fit(X).labels_
+
+
+# ============================================================
+# Benchmark : temps et mémoire de fit de 100k à 10M lignes
+# ============================================================
+
+def benchmark(sizes=(100_000, 1_000_000, 10_000_000), n_features=4, k_candidates=range(2, 8)):
+    rng = np.random.RandomState(0)
+    reports = []
+    for n in sizes:
+        centers = rng.uniform(0, 10, size=(5, n_features))
+        X = centers[rng.randint(0, 5, size=n)] + rng.normal(0, 1, size=(n, n_features))
+        model = AutoKMeans(k_candidates=k_candidates, n_init=3, track_memory=True).fit(X)
+        reports.append(model.fit_report_)
+        print(model.fit_report_)
+        del X
+    return reports
+
+
+if __name__ == "__main__":
+    import sys
+    sizes = tuple(int(s) for s in sys.argv[1:]) or (100_000, 1_000_000, 10_000_000)
+    benchmark(sizes)
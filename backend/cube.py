@@ -0,0 +1,235 @@
+# backend/cube.py
+"""
+Cube d'agrégats précalculé pour les requêtes d'exploration filtrées.
+
+Pour chaque combinaison des dimensions (région, genre, type d'école,
+option préférée, cluster) on garde, par cellule : le nombre de lignes et,
+pour chaque score / soft skill, le nombre de valeurs, la somme et la somme
+des carrés. Moyennes et écarts-types (ddof=1, comme pandas) s'en déduisent
+sans repasser sur le DataFrame.
+
+Le cube est construit une fois par centre (et donc par jeu de modèles)
+puis gardé dans le registre.
+
+    python cube.py [taille1 taille2 ...]   → benchmark + vérification vs pandas
+"""
+import itertools
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from recommender import _ensure_models
+from registry import REGISTRY, normalize_centre
+
+DIMENSIONS = ["region", "gender", "school_type", "preferred_option", "cluster"]
+MEASURES = [
+    "math_score", "physics_score", "literature_score", "english_score",
+    "communication", "teamwork", "leadership", "problem_solving",
+]
+
+_MISSING = "__missing__"
+
+
+def _cluster_labels(models: Dict) -> List[str]:
+    label_map = models['cluster_label_map']
+    return [label_map.get(int(i), str(i)) for i in models['clusters']]
+
+
+def build_cube(df: pd.DataFrame) -> Dict:
+    """Construit tous les cuboïdes (2^dimensions) à partir du DataFrame."""
+    t0 = time.perf_counter()
+    dims = [d for d in DIMENSIONS if d in df.columns]
+    measures = [m for m in MEASURES if m in df.columns]
+
+    vals = df[measures].to_numpy(dtype=float)
+    present = ~np.isnan(vals)
+    filled = np.where(present, vals, 0.0)
+    # colonnes : n | cnt_m... | sum_m... | sq_m...
+    stats = np.hstack([
+        np.ones((len(df), 1)),
+        present.astype(float),
+        filled,
+        filled ** 2,
+    ])
+    keys = df[dims].astype(object).where(df[dims].notna(), _MISSING).astype(str)
+    base = pd.concat([keys.reset_index(drop=True), pd.DataFrame(stats)], axis=1)
+    base = base.groupby(dims, sort=False).sum()
+
+    cuboids = {}
+    for r in range(len(dims) + 1):
+        for subset in itertools.combinations(dims, r):
+            if not subset:
+                cuboids[subset] = {(): base.to_numpy().sum(axis=0)}
+                continue
+            agg = base.groupby(level=list(subset), sort=False).sum()
+            cuboids[subset] = {
+                tuple(None if v == _MISSING else v for v in (k if isinstance(k, tuple) else (k,))): row
+                for k, row in zip(agg.index, agg.to_numpy())
+            }
+
+    return {
+        "dimensions": dims,
+        "measures": measures,
+        "cuboids": cuboids,
+        "n_rows": int(len(df)),
+        "build_seconds": round(time.perf_counter() - t0, 4),
+    }
+
+
+def _finalize(measures: List[str], mat: np.ndarray) -> List[Dict]:
+    """Moyennes / écarts-types de toutes les cellules d'un coup (une ligne par groupe)."""
+    m = len(measures)
+    cnt, sums, sqs = mat[:, 1:1 + m], mat[:, 1 + m:1 + 2 * m], mat[:, 1 + 2 * m:1 + 3 * m]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(cnt > 0, sums / cnt, np.nan)
+        var = np.where(cnt > 1, (sqs - sums * mean) / (cnt - 1), np.nan)
+    std = np.sqrt(np.clip(var, 0.0, None))
+    mean_rows = np.where(np.isnan(mean), None, mean).tolist()
+    std_rows = np.where(np.isnan(std), None, std).tolist()
+    counts = mat[:, 0].astype(int).tolist()
+    return [
+        {
+            "count": counts[i],
+            "mean": dict(zip(measures, mean_rows[i])),
+            "std": dict(zip(measures, std_rows[i])),
+        }
+        for i in range(len(counts))
+    ]
+
+
+def _normalize_filters(filters) -> Dict[str, set]:
+    """{dimension: valeur ou liste de valeurs} → {dimension: ensemble de chaînes}."""
+    if filters is None:
+        return {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters doit être un objet {dimension: valeur(s)}.")
+    out = {}
+    for k, v in filters.items():
+        values = [v] if isinstance(v, str) else v
+        if not isinstance(values, (list, tuple, set)) or not all(isinstance(x, str) for x in values):
+            raise ValueError(f"Filtre '{k}' : une valeur texte ou une liste de valeurs texte est attendue.")
+        out[k] = set(values)
+    return out
+
+
+def query_cube(cube: Dict, filters: Optional[Dict[str, Iterable]] = None,
+               group_by: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Répond à un filtre (égalité ou liste de valeurs par dimension) + group-by
+    à partir du plus petit cuboïde couvrant ces dimensions.
+    """
+    filters = _normalize_filters(filters)
+    group_by = [group_by] if isinstance(group_by, str) else (group_by or [])
+    if not isinstance(group_by, (list, tuple)) or not all(isinstance(d, str) for d in group_by):
+        raise ValueError("group_by doit être une dimension ou une liste de dimensions.")
+    group_by = list(group_by)
+    unknown = [d for d in list(filters) + group_by if d not in cube["dimensions"]]
+    if unknown:
+        raise ValueError(f"Dimension(s) inconnue(s) : {', '.join(unknown)}")
+
+    dims = tuple(d for d in cube["dimensions"] if d in filters or d in group_by)
+    cells = cube["cuboids"][dims]
+    pos = {d: i for i, d in enumerate(dims)}
+    checks = [(pos[d], allowed) for d, allowed in filters.items()]
+    proj = [pos[d] for d in group_by]
+
+    groups: Dict[tuple, np.ndarray] = {}
+    for key, vec in cells.items():
+        if any(key[i] not in allowed for i, allowed in checks):
+            continue
+        gkey = tuple(key[i] for i in proj)
+        if None in gkey:
+            continue  # comme pandas.groupby(dropna=True)
+        acc = groups.get(gkey)
+        groups[gkey] = vec.copy() if acc is None else acc + vec
+
+    if not groups:
+        return []
+    gkeys = sorted(groups)
+    stats = _finalize(cube["measures"], np.vstack([groups[k] for k in gkeys]))
+    return [{**dict(zip(group_by, k)), **st} for k, st in zip(gkeys, stats)]
+
+
+def get_cube(centre: Optional[str] = None) -> Dict:
+    centre = normalize_centre(centre)
+
+    def load():
+        models = _ensure_models(centre)
+        df = models['df'].copy()
+        df['cluster'] = _cluster_labels(models)
+        return build_cube(df)
+
+    return REGISTRY.get(('cube', centre), load)
+
+
+# ============================================================
+# Benchmark : latence des requêtes vs taille de la table,
+# avec vérification contre un groupby pandas direct
+# ============================================================
+
+def _pandas_answer(df, filters, group_by, measures):
+    mask = np.ones(len(df), dtype=bool)
+    for d, v in filters.items():
+        mask &= df[d].isin([v] if isinstance(v, str) else v).to_numpy()
+    grouped = df[mask].groupby(group_by)
+    out = grouped[measures].agg(["count", "mean", "std"])
+    out[("_rows", "size")] = grouped.size()
+    return out
+
+
+def _check(cube_rows, expected, group_by, measures):
+    assert len(cube_rows) == len(expected), (len(cube_rows), len(expected))
+    for row in cube_rows:
+        key = tuple(row[d] for d in group_by)
+        exp = expected.loc[key if len(key) > 1 else key[0]]
+        assert row["count"] == exp[("_rows", "size")], (key, row["count"], exp[("_rows", "size")])
+        for m in measures:
+            for stat in ("mean", "std"):
+                got, want = row[stat][m], exp[(m, stat)]
+                if got is None:
+                    assert pd.isna(want), (key, m, stat, want)
+                else:
+                    assert abs(got - want) <= 1e-6 * max(1.0, abs(want)), (key, m, stat, got, want)
+
+
+def benchmark(sizes=(2_000, 100_000, 1_000_000), n_queries=200):
+    models = _ensure_models()
+    source = models['df'].copy()
+    source['cluster'] = _cluster_labels(models)
+    rng = np.random.RandomState(0)
+    queries = [
+        ({}, ["region"]),
+        ({"gender": "F"}, ["school_type"]),
+        ({"region": source["region"].dropna().iloc[0]}, ["preferred_option", "cluster"]),
+        ({"school_type": ["Public", "Private"]}, ["gender", "cluster"]),
+    ]
+    for n in sizes:
+        df = source.sample(n, replace=True, random_state=rng).reset_index(drop=True)
+        cube = build_cube(df)
+        measures = cube["measures"]
+
+        for filters, group_by in queries:
+            _check(query_cube(cube, filters, group_by), _pandas_answer(df, filters, group_by, measures), group_by, measures)
+
+        t0 = time.perf_counter()
+        for i in range(n_queries):
+            query_cube(cube, *queries[i % len(queries)])
+        t_cube = (time.perf_counter() - t0) / n_queries
+
+        t0 = time.perf_counter()
+        for i in range(len(queries)):
+            _pandas_answer(df, *queries[i], measures)
+        t_pandas = (time.perf_counter() - t0) / len(queries)
+
+        print(
+            f"{n:>10,} lignes — build {cube['build_seconds']:.3f}s, "
+            f"cube {t_cube * 1e6:,.0f} µs/requête, pandas {t_pandas * 1e6:,.0f} µs/requête"
+        )
+
+
+if __name__ == "__main__":
+    import sys
+    sizes = tuple(int(s) for s in sys.argv[1:]) or (2_000, 100_000, 1_000_000)
+    benchmark(sizes)
@@ -1,14 +1,19 @@
 # backend/ml_logic.py
 import os
+import joblib
 import numpy as np
 import pandas as pd
+import sklearn
 
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.preprocessing import OrdinalEncoder
-from sklearn.cluster import KMeans
+
+from clustering import AutoKMeans, load_reference_centers, save_reference_centers
+from registry import REGISTRY, centre_csv_path, normalize_centre
+from profiling import profile_training
 
 # ============================================================
-# 1) Chargement du dataset
+# 1) Chargement du dataset (un CSV par centre, voir registry.py)
 # ============================================================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -18,19 +23,14 @@ CSV_PATH = os.path.join(
     "att.L2JHaz4Is_GMV7IkT1b-qO8ET7LOeLr8XgzQ-SmmWZ0.csv"
 )
 
-df = pd.read_csv(CSV_PATH)
-
 LEVEL_COLS = ["math_level", "physics_level", "literature_level", "english_level"]
 SOFT_COLS = ["communication", "teamwork", "leadership", "problem_solving"]
+FEATURES = LEVEL_COLS + SOFT_COLS
 
-df[SOFT_COLS] = df[SOFT_COLS].fillna(0)
-
-# ============================================================
-# 2) Encodage niveaux A/B/C/D → 0/1/2/3
-# ============================================================
 
-enc = OrdinalEncoder(categories=[["D", "C", "B", "A"]] * 4)
-df[LEVEL_COLS] = enc.fit_transform(df[LEVEL_COLS])
+def centre_dataset_path(centre=None) -> str:
+    path = centre_csv_path(centre)
+    return str(path) if path is not None else CSV_PATH
 
 # ============================================================
 # 3) 🔥 Nouveau calcul du niveau global (MODE) — comme le NOTEBOOK
@@ -41,115 +41,242 @@ def row_mode(vals):
     vals = [v for v in vals if pd.notna(v)]
     return pd.Series(vals).mode().iloc[0]
 
-# On récupère les lettres via l'inverse transform
-decoded_levels = enc.inverse_transform(df[LEVEL_COLS])
-
-df["overall_letter"] = [
-    row_mode(list(row))
-    for row in decoded_levels
-]
-
-df["global_level"] = df["overall_letter"].map({
-    "A": "Level 4",
-    "B": "Level 3",
-    "C": "Level 2",
-    "D": "Level 1"
-})
-
 # ============================================================
-# 4) Modèle de Classification
+# 5) K-Means soft skills (k choisi automatiquement, voir clustering.py)
 # ============================================================
 
-FEATURES = LEVEL_COLS + SOFT_COLS
-X = df[FEATURES]
-y = df["global_level"]
+def soft_cluster_recommendation(center) -> str:
+    """Texte de recommandation déduit du profil moyen du cluster (indépendant de k)."""
+    if max(center) - min(center) < 1:
+        return "Renforcer progressivement tous les soft skills pour un profil équilibré."
+    weakest = int(np.argmin(center))
+    if weakest == 0:
+        return "Développer la communication via des ateliers interactifs et exercices d’expression orale."
+    if weakest == 3:
+        return "Renforcer la résolution de problèmes à travers des cas pratiques."
+    if weakest == 2:
+        return "Stimuler le leadership grâce à des mini-projets."
+    return "Consolider leadership et communication tout en valorisant l’esprit collaboratif."
+
+
+@profile_training("ml_logic.build_models")
+def build_models(csv_path: str, centre=None) -> dict:
+    """Entraîne encodeur, arbre de décision et K-Means pour un dataset."""
+    df = pd.read_csv(csv_path)
+    df[SOFT_COLS] = df[SOFT_COLS].fillna(0)
+
+    # 2) Encodage niveaux A/B/C/D → 0/1/2/3
+    enc = OrdinalEncoder(categories=[["D", "C", "B", "A"]] * 4)
+    df[LEVEL_COLS] = enc.fit_transform(df[LEVEL_COLS])
+
+    # 3) Niveau global = lettre majoritaire
+    decoded_levels = enc.inverse_transform(df[LEVEL_COLS])
+    df["overall_letter"] = [
+        row_mode(list(row))
+        for row in decoded_levels
+    ]
+    df["global_level"] = df["overall_letter"].map({
+        "A": "Level 4",
+        "B": "Level 3",
+        "C": "Level 2",
+        "D": "Level 1"
+    })
+
+    # 4) Modèle de Classification
+    model = DecisionTreeClassifier(
+        max_depth=8,
+        class_weight="balanced",
+        random_state=42
+    )
+    model.fit(df[FEATURES], df["global_level"])
 
-model = DecisionTreeClassifier(
-    max_depth=8,
-    class_weight="balanced",
-    random_state=42
-)
-model.fit(X, y)
+    # 5) K-Means soft skills
+    #    (un ré-entraînement repart des centres précédents : mêmes clusters, mêmes conseils)
+    ref_name = f"soft_{normalize_centre(centre)}"
+    kmeans = AutoKMeans(k_candidates=range(3, 8), random_state=42, n_init=10,
+                        reference_centers=load_reference_centers(ref_name))
+    df["cluster_soft"] = kmeans.fit_predict(df[SOFT_COLS])
+    save_reference_centers(ref_name, kmeans.cluster_centers_)
+
+    return {
+        "csv_path": csv_path,
+        "df": df,
+        "enc": enc,
+        "model": model,
+        "kmeans": kmeans,
+        "cluster_profiles": df.groupby("cluster_soft")[SOFT_COLS].mean().round(2),
+        "cluster_rec": {
+            i: soft_cluster_recommendation(center)
+            for i, center in enumerate(kmeans.cluster_centers_)
+        },
+    }
 
-# ============================================================
-# 5) K-Means soft skills
-# ============================================================
 
-kmeans = KMeans(n_clusters=5, random_state=42, n_init=10)
-df["cluster_soft"] = kmeans.fit_predict(df[SOFT_COLS])
-cluster_profiles = df.groupby("cluster_soft")[SOFT_COLS].mean().round(2)
+def get_models(centre=None) -> dict:
+    """Modèles du centre, entraînés à la première demande puis gardés dans le registre."""
+    centre = normalize_centre(centre)
+    return REGISTRY.get(("ml_logic", centre), lambda: build_models(centre_dataset_path(centre), centre))
 
 # ============================================================
-# 5 bis) Régression satisfaction (inchangée)
+# 5 bis) Régression satisfaction — entraînée à la demande, servie en batch
 # ============================================================
 
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.impute import SimpleImputer
+
 try:
+    import xgboost
     from xgboost import XGBRegressor
-    from sklearn.compose import ColumnTransformer
-    from sklearn.pipeline import Pipeline
-    from sklearn.model_selection import train_test_split
-    from sklearn.metrics import mean_absolute_error, r2_score
-    from sklearn.preprocessing import OneHotEncoder, StandardScaler
-    from sklearn.impute import SimpleImputer
-
-    if "satisfaction" in df.columns:
-
-        y_reg = df["satisfaction"].dropna()
-
-        X_reg = df.loc[y_reg.index].drop(
-            columns=[
-                "satisfaction",
-                "student_id", "enrollment_date",
-                "overall_letter", "overall_level_num", "overall_level"
-            ] + LEVEL_COLS,
-            errors="ignore"
-        )
+except ImportError:
+    xgboost = XGBRegressor = None
+    from sklearn.ensemble import GradientBoostingRegressor
 
-        num_f = X_reg.select_dtypes(include=[np.number]).columns.tolist()
-        cat_f = [c for c in X_reg.columns if c not in num_f]
+MODELS_DIR = os.path.join(BASE_DIR, "models")
 
-        prep_reg = ColumnTransformer([
+# À incrémenter à chaque changement du code d'entraînement (features,
+# hyperparamètres…) : invalide les modèles satisfaction déjà sauvegardés
+SAT_SCHEMA_VERSION = 2
 
-            ("num", Pipeline([
-                ("imp", SimpleImputer(strategy="median")),
-                ("sc", StandardScaler())
-            ]), num_f),
+# Colonnes exclues : cible, identifiants et colonnes dérivées par ce module
+SAT_DROP = [
+    "satisfaction", "student_id", "enrollment_date",
+    "overall_letter", "global_level", "cluster_soft",
+] + LEVEL_COLS
 
-            ("cat", Pipeline([
-                ("imp", SimpleImputer(strategy="most_frequent")),
-                ("oh", OneHotEncoder(handle_unknown="ignore"))
-            ]), cat_f)
-        ])
 
-        Xtr, Xte, ytr, yte = train_test_split(
-            X_reg, y_reg, test_size=0.2, random_state=42
-        )
+def satisfaction_path(centre=None) -> str:
+    centre = normalize_centre(centre)
+    return os.path.join(MODELS_DIR, f"satisfaction_{centre}.joblib")
+
+
+def _dataset_signature(csv_path: str) -> dict:
+    st = os.stat(csv_path)
+    return {
+        "csv_mtime": st.st_mtime,
+        "csv_size": st.st_size,
+        "backend": "xgboost" if XGBRegressor is not None else "sklearn",
+        "schema_version": SAT_SCHEMA_VERSION,
+        "drop": list(SAT_DROP),
+        "sklearn_version": sklearn.__version__,
+        "xgboost_version": getattr(xgboost, "__version__", None),
+    }
+
+
+@profile_training("ml_logic._train_satisfaction")
+def _train_satisfaction(df: pd.DataFrame, csv_path: str) -> dict:
+    y_reg = df["satisfaction"].dropna()
+    X_reg = df.loc[y_reg.index].drop(columns=SAT_DROP, errors="ignore")
+
+    num_f = X_reg.select_dtypes(include=[np.number]).columns.tolist()
+    cat_f = [c for c in X_reg.columns if c not in num_f]
 
-        xgb = Pipeline([
-            ("prep", prep_reg),
-            ("xgb", XGBRegressor(
-                n_estimators=300,
-                learning_rate=0.05,
-                max_depth=6,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                random_state=42
-            ))
-        ])
-
-        xgb.fit(Xtr, ytr)
-        pred = xgb.predict(Xte)
-
-        print("\n===== XGBOOST REGRESSION REPORT =====")
-        print("MAE :", round(mean_absolute_error(yte, pred), 3))
-        print("R² :", round(r2_score(yte, pred), 3))
-        print("=====================================\n")
+    prep_reg = ColumnTransformer([
 
+        ("num", Pipeline([
+            ("imp", SimpleImputer(strategy="median")),
+            ("sc", StandardScaler())
+        ]), num_f),
+
+        ("cat", Pipeline([
+            ("imp", SimpleImputer(strategy="most_frequent")),
+            ("oh", OneHotEncoder(handle_unknown="ignore"))
+        ]), cat_f)
+    ])
+
+    if XGBRegressor is not None:
+        regressor = XGBRegressor(
+            n_estimators=300,
+            learning_rate=0.05,
+            max_depth=6,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            random_state=42
+        )
     else:
-        print("⚠️ Colonne 'satisfaction' absente → régression ignorée.\n")
+        regressor = GradientBoostingRegressor(
+            n_estimators=300,
+            learning_rate=0.05,
+            max_depth=3,
+            subsample=0.8,
+            random_state=42
+        )
+
+    Xtr, Xte, ytr, yte = train_test_split(
+        X_reg, y_reg, test_size=0.2, random_state=42
+    )
+
+    pipe = Pipeline([("prep", prep_reg), ("reg", regressor)])
+    pipe.fit(Xtr, ytr)
+    pred = pipe.predict(Xte)
+    metrics = {
+        "mae": round(float(mean_absolute_error(yte, pred)), 3),
+        "r2": round(float(r2_score(yte, pred)), 3),
+    }
+
+    print("\n===== SATISFACTION REGRESSION REPORT =====")
+    print("Modèle :", type(regressor).__name__)
+    print("MAE :", metrics["mae"])
+    print("R² :", metrics["r2"])
+    print("==========================================\n")
+
+    return {
+        "pipeline": pipe,
+        "features": X_reg.columns.tolist(),
+        "metrics": metrics,
+        **_dataset_signature(csv_path),
+    }
+
+
+def _load_satisfaction(centre: str) -> dict:
+    models = get_models(centre)
+    if "satisfaction" not in models["df"].columns:
+        raise ValueError("Colonne 'satisfaction' absente du dataset.")
+
+    path = satisfaction_path(centre)
+    sig = _dataset_signature(models["csv_path"])
+    if os.path.exists(path):
+        try:
+            saved = joblib.load(path)
+            if all(saved.get(k) == v for k, v in sig.items()):
+                return saved
+        except Exception as e:
+            print("⚠️ Modèle satisfaction illisible, ré-entraînement :", e)
+
+    bundle = _train_satisfaction(models["df"], models["csv_path"])
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    joblib.dump(bundle, path)
+    return bundle
+
+
+def get_satisfaction_model(centre=None) -> dict:
+    """
+    Retourne le pipeline satisfaction du centre (chargé une seule fois par process).
+    Ré-entraîné uniquement si le CSV, le backend (xgboost/sklearn), leurs
+    versions ou SAT_SCHEMA_VERSION ont changé depuis la dernière sauvegarde
+    dans models/.
+    """
+    centre = normalize_centre(centre)
+    return REGISTRY.get(("satisfaction", centre), lambda: _load_satisfaction(centre))
+
+
+def predict_satisfaction(records: list, centre=None) -> list:
+    """
+    Score une liste d'étudiants en un seul passage : ColumnTransformer et
+    modèle sont appliqués une fois sur tout le batch.
+    """
+    if not records:
+        return []
+    bundle = get_satisfaction_model(centre)
+    X_batch = pd.DataFrame.from_records(records).reindex(columns=bundle["features"])
+    num_f = bundle["pipeline"].named_steps["prep"].transformers_[0][2]
+    X_batch[num_f] = X_batch[num_f].apply(pd.to_numeric, errors="coerce")
+    preds = bundle["pipeline"].predict(X_batch)
+    return [round(float(p), 3) for p in preds]
 
-except Exception as e:
-    print("⚠️ XGBoost non exécuté :", e)
 
 # ============================================================
 # 6) Conversion note (inchangé)
@@ -171,7 +298,7 @@ def score_to_level(score: float) -> str:
 # 7) Recommandation dynamique (inchangé)
 # ============================================================
 
-def generate_dynamic_recommendation(level, cluster, levels_letters, soft_vals):
+def generate_dynamic_recommendation(level, cluster, levels_letters, soft_vals, cluster_rec):
     communication, teamwork, leadership, problem_solving = soft_vals
 
     weaknesses = []
@@ -234,14 +361,6 @@ def generate_dynamic_recommendation(level, cluster, levels_letters, soft_vals):
 
     plan_html = "".join([f"<li>{step}</li>" for step in action_plans[level]])
 
-    cluster_rec = {
-        0: "Développer la communication via des ateliers interactifs et exercices d’expression orale.",
-        1: "Renforcer la résolution de problèmes à travers des cas pratiques.",
-        2: "Stimuler le leadership grâce à des mini-projets.",
-        3: "Renforcer progressivement tous les soft skills pour un profil équilibré.",
-        4: "Consolider leadership et communication tout en valorisant l’esprit collaboratif."
-    }
-
     html = f"""
     <div class='reco-block'>
         <h5>📘 Diagnostic général — <span class='text-primary'>{level}</span></h5>
@@ -275,7 +394,9 @@ def generate_dynamic_recommendation(level, cluster, levels_letters, soft_vals):
 # 8) Fonction finale utilisée par app.py (inchangée)
 # ============================================================
 
-def predict_student(data: dict) -> dict:
+def predict_student(data: dict, centre=None) -> dict:
+    models = get_models(centre)
+    enc = models["enc"]
 
     levels_letters = {
         "math_level": score_to_level(float(data.get("math_score", 0))),
@@ -300,14 +421,15 @@ def predict_student(data: dict) -> dict:
 
     X_pred = np.hstack([encoded_levels, soft_vals]).reshape(1, -1)
 
-    predicted_level = model.predict(X_pred)[0]
-    cluster_soft = int(kmeans.predict([soft_vals])[0])
+    predicted_level = models["model"].predict(X_pred)[0]
+    cluster_soft = int(models["kmeans"].predict([soft_vals])[0])
 
     recommendation = generate_dynamic_recommendation(
         predicted_level,
         cluster_soft,
         levels_letters,
-        soft_vals
+        soft_vals,
+        models["cluster_rec"]
     )
 
     return {
@@ -315,3 +437,32 @@ def predict_student(data: dict) -> dict:
         "cluster_soft": cluster_soft,
         "recommendation": recommendation,
     }
+
+
+# ============================================================
+# 9) Benchmark débit satisfaction : ligne par ligne vs batch
+#    python ml_logic.py [taille_batch]
+# ============================================================
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    records = (
+        get_models()["df"].drop(columns=SAT_DROP, errors="ignore")
+        .sample(n, replace=True, random_state=0)
+        .to_dict("records")
+    )
+    get_satisfaction_model()
+
+    t0 = time.perf_counter()
+    for r in records:
+        predict_satisfaction([r])
+    t_single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    predict_satisfaction(records)
+    t_batch = time.perf_counter() - t0
+
+    print(f"{n} étudiants — unitaire : {n / t_single:,.0f} préd/s, batch : {n / t_batch:,.0f} préd/s")
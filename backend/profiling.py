@@ -0,0 +1,243 @@
+# backend/profiling.py
+"""
+Profilage à la demande pour les deux apps Flask (app.py et rania.py).
+
+Déclenchement (désactivé par défaut, aucun hook installé dans ce cas) :
+- par requête : en-tête `X-Profile: <PROFILE_TOKEN>` ou `?__profile=<PROFILE_TOKEN>`
+- par échantillonnage : PROFILE_SAMPLE_RATE=0.01 → 1 % du trafic
+  (exige aussi PROFILE_TOKEN, sans quoi les fichiers ne seraient pas
+  consultables : l'échantillonnage est alors désactivé)
+- entraînement : PROFILE_TRAINING=1 profile les fonctions décorées par
+  @profile_training (recommender._build_models, ml_logic.build_models,
+  ml_logic._train_satisfaction)
+
+PROFILE_MODE=cprofile (défaut) écrit un fichier .prof (pstats) ;
+PROFILE_MODE=sample échantillonne la pile du handler et écrit un fichier
+.folded (collapsed stacks, lisible par flamegraph.pl ou speedscope).
+
+Les fichiers vont dans PROFILE_DIR (défaut : backend/profiles) et sont
+listés / téléchargeables via GET /admin/profiles (token requis). Seuls les
+PROFILE_MAX_FILES plus récents (défaut : 200) sont conservés.
+
+Une seule capture à la fois par thread : un entraînement déclenché pendant
+une requête profilée (démarrage à froid) apparaît dans le profil de la
+requête au lieu d'ouvrir une capture imbriquée.
+"""
+import cProfile
+import functools
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import abort, g, jsonify, request, send_from_directory
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0) or 0)
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "cprofile")
+PROFILE_TRAINING = os.environ.get("PROFILE_TRAINING", "") not in ("", "0", "false")
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", 5)) / 1000
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+
+if PROFILE_SAMPLE_RATE > 0 and not PROFILE_TOKEN:
+    print("⚠️ PROFILE_SAMPLE_RATE ignoré : PROFILE_TOKEN requis pour consulter les profils")
+    PROFILE_SAMPLE_RATE = 0.0
+
+ADMIN_ENDPOINTS = ("list_profiles", "download_profile")
+
+# capture en cours sur le thread courant (cProfile n'accepte qu'un profileur actif)
+_local = threading.local()
+
+
+# ============================================================
+# Capture : cProfile ou échantillonnage statistique de la pile
+# ============================================================
+
+class StackSampler:
+    """Échantillonne la pile d'un thread à intervalle fixe (format collapsed stacks)."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+def _capture_active() -> bool:
+    return getattr(_local, "active", False)
+
+
+def _start_capture():
+    _local.active = True
+    if PROFILE_MODE == "sample":
+        capture = StackSampler(threading.get_ident())
+        capture.start()
+    else:
+        capture = cProfile.Profile()
+        capture.enable()
+    return capture
+
+
+def _stop_capture(capture, label: str, elapsed_ms: float) -> str:
+    _local.active = False
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+    base = os.path.join(PROFILE_DIR, f"{stamp}_{safe}_{elapsed_ms:.0f}ms")
+    if isinstance(capture, StackSampler):
+        capture.stop()
+        path = base + ".folded"
+        capture.dump(path)
+    else:
+        capture.disable()
+        path = base + ".prof"
+        capture.dump_stats(path)
+    _prune()
+    return path
+
+
+def _prune():
+    """Ne garde que les PROFILE_MAX_FILES profils les plus récents."""
+    files = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith((".prof", ".folded")))
+    for f in files[:max(len(files) - PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, f))
+        except OSError:
+            pass
+
+
+# ============================================================
+# Profilage de l'entraînement
+# ============================================================
+
+def profile_training(label: str):
+    """Décorateur : profile la fonction si PROFILE_TRAINING est actif, sinon ne fait rien."""
+    def decorator(func):
+        if not PROFILE_TRAINING:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _capture_active():
+                # déjà couvert par la capture de la requête en cours
+                return func(*args, **kwargs)
+            capture = _start_capture()
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                path = _stop_capture(capture, f"train_{label}", (time.perf_counter() - t0) * 1000)
+                print(f"🔬 Profil d'entraînement écrit : {path}")
+        return wrapper
+    return decorator
+
+
+# ============================================================
+# Hooks Flask
+# ============================================================
+
+def _token_ok(value: str) -> bool:
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(value or "", PROFILE_TOKEN)
+
+
+def _requested() -> bool:
+    token = request.headers.get("X-Profile") or request.args.get("__profile")
+    if token:
+        return _token_ok(token)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def init_profiling(app):
+    """
+    Installe les hooks de profilage sur `app`. Sans PROFILE_TOKEN ni
+    PROFILE_SAMPLE_RATE, rien n'est installé : aucun surcoût par requête.
+    """
+    if PROFILE_TOKEN:
+        _register_admin_routes(app)
+    if not PROFILE_TOKEN and PROFILE_SAMPLE_RATE <= 0:
+        return
+
+    @app.before_request
+    def _profile_start():
+        if request.endpoint not in ADMIN_ENDPOINTS and not _capture_active() and _requested():
+            g._profile_t0 = time.perf_counter()
+            g._profile_capture = _start_capture()
+
+    @app.after_request
+    def _profile_stop(response):
+        capture = g.pop("_profile_capture", None)
+        if capture is not None:
+            elapsed = (time.perf_counter() - g.pop("_profile_t0")) * 1000
+            label = f"{app.name}_{request.endpoint or 'unknown'}"
+            path = _stop_capture(capture, label, elapsed)
+            response.headers["X-Profile-File"] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def _profile_cleanup(exc):
+        # requête interrompue par une exception : on arrête quand même la capture
+        capture = g.pop("_profile_capture", None)
+        if capture is not None:
+            elapsed = (time.perf_counter() - g.pop("_profile_t0")) * 1000
+            _stop_capture(capture, f"{app.name}_{request.endpoint or 'unknown'}_error", elapsed)
+
+
+def _register_admin_routes(app):
+
+    def _check_auth():
+        if not _token_ok(request.headers.get("X-Profile") or request.args.get("token")):
+            abort(403)
+
+    @app.route("/admin/profiles", methods=["GET"])
+    def list_profiles():
+        """Liste les profils enregistrés, du plus récent au plus ancien."""
+        _check_auth()
+        if not os.path.isdir(PROFILE_DIR):
+            return jsonify([])
+        files = sorted(
+            (f for f in os.listdir(PROFILE_DIR) if f.endswith((".prof", ".folded"))),
+            reverse=True,
+        )
+        return jsonify([
+            {
+                "name": f,
+                "size": os.path.getsize(os.path.join(PROFILE_DIR, f)),
+                "format": "pstats" if f.endswith(".prof") else "collapsed",
+            }
+            for f in files
+        ])
+
+    @app.route("/admin/profiles/<path:name>", methods=["GET"])
+    def download_profile(name):
+        _check_auth()
+        return send_from_directory(PROFILE_DIR, name, as_attachment=True)
@@ -8,11 +8,26 @@ from recommender import (
     get_clustered_students,
     get_exploration_overview,
 )
+from bulk_scoring import get_stored_recommendation
+from cube import DIMENSIONS, get_cube, query_cube
+from registry import normalize_centre
+from profiling import init_profiling
+from admission import init_admission
 
 app = Flask(__name__)
 CORS(app)
+init_profiling(app)
+admission = init_admission(app)
 
 DF_CACHE = None
+STATS_CACHE = None
+
+def request_centre(data=None):
+    """Centre demandé : ?centre=<id> ou champ "centre" du JSON (défaut : dataset historique)."""
+    centre = request.args.get("centre")
+    if not centre and isinstance(data, dict):
+        centre = data.get("centre")
+    return normalize_centre(centre)
 
 def load_dataset():
     global DF_CACHE
@@ -32,11 +47,29 @@ def root():
 
 @app.route("/rania/recommend", methods=["POST"]) 
 @app.route("/recommend", methods=["POST"]) 
+@admission.guard
 def recommend():
     data = request.get_json() or {}
     try:
-        details = get_recommendation_details(data)
+        details = get_recommendation_details(data, request_centre(data))
+        return jsonify(details)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/rania/recommend/<student_id>", methods=["GET"]) 
+@app.route("/recommend/<student_id>", methods=["GET"]) 
+def recommend_known_student(student_id):
+    try:
+        details = get_stored_recommendation(student_id, request_centre())
+        if details is None:
+            return jsonify({"error": f"Aucun score précalculé pour {student_id} (lancer bulk_scoring.py)"}), 404
         return jsonify(details)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -53,6 +86,9 @@ def get_formations():
 @app.route("/rania/stats", methods=["GET"]) 
 @app.route("/stats", methods=["GET"]) 
 def get_stats():
+    global STATS_CACHE
+    if STATS_CACHE is not None:
+        return jsonify(STATS_CACHE)
     try:
         df = load_dataset()
         total_students = len(df)
@@ -72,12 +108,13 @@ def get_stats():
                 "english_score": "mean",
             }).rename(columns={"student_id": "count"}).reset_index()
         )
-        return jsonify({
+        STATS_CACHE = {
             "total_students": total_students,
             "total_formations": total_formations,
             "average_scores": average_scores,
             "formation_stats": formation_stats.to_dict("records"),
-        })
+        }
+        return jsonify(STATS_CACHE)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -102,12 +139,16 @@ def get_students():
 @app.route("/students_clusters", methods=["GET"]) 
 def students_clusters():
     try:
-        students = get_clustered_students()
+        students = get_clustered_students(request_centre())
         counts = {}
         for s in students:
             c = s.get("cluster", "Unknown")
             counts[c] = counts.get(c, 0) + 1
         return jsonify({"counts": counts, "students": students})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -115,8 +156,50 @@ def students_clusters():
 @app.route("/explore", methods=["GET"]) 
 def explore():
     try:
-        overview = get_exploration_overview()
+        overview = get_exploration_overview(request_centre())
         return jsonify(overview)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/rania/explore/query", methods=["GET", "POST"]) 
+@app.route("/explore/query", methods=["GET", "POST"]) 
+def explore_query():
+    """
+    Agrégats filtrés servis par le cube précalculé.
+    GET  : ?group_by=region,gender&school_type=Public,Private&cluster=moyen
+    POST : {"filters": {"gender": "F"}, "group_by": ["region"]}
+    """
+    try:
+        if request.method == "POST":
+            data = request.get_json() or {}
+            filters = data.get("filters") or {}
+            group_by = data.get("group_by") or []
+            if isinstance(group_by, str):
+                group_by = [group_by]
+        else:
+            data = None
+            group_by = [g for g in request.args.get("group_by", "").split(",") if g]
+            # seules les dimensions du cube servent de filtres (les autres
+            # paramètres — centre, __profile, cache-busters… — sont ignorés)
+            filters = {
+                k: v.split(",")
+                for k, v in request.args.items()
+                if k in DIMENSIONS
+            }
+        cube = get_cube(request_centre(data))
+        return jsonify({
+            "filters": filters,
+            "group_by": group_by,
+            "groups": query_cube(cube, filters, group_by),
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
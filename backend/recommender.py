@@ -1,13 +1,22 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 import os
+import uuid
+import joblib
+import sklearn
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.cluster import KMeans
 
-def load_dataset():
+from clustering import AutoKMeans, label_ranks, load_reference_centers, save_reference_centers
+from registry import REGISTRY, centre_csv_path, normalize_centre
+from profiling import profile_training
+
+def load_dataset(centre: Optional[str] = None):
+    centre_path = centre_csv_path(centre)
+    if centre_path is not None:
+        return pd.read_csv(centre_path)
     current_dir = Path(__file__).parent
     primary = current_dir / 'etudiants.csv'
     if primary.exists():
@@ -126,12 +135,81 @@ def get_recommendations(profile: Dict) -> List[Dict]:
     
     return recommendations[:5]  # Retourner les 5 meilleures recommandations
 
-_MODEL_CACHE: Dict[str, object] = {}
+PARCOURS = {
+    "Engineering": ["Math Avancé", "Physique Appliquée", "Python"],
+    "Science": ["Biologie", "Chimie", "Statistiques"],
+    "IT": ["Algorithmique", "Développement Web", "Python"],
+    "Letters": ["Littérature", "Communication", "Philosophie"],
+    "Arts": ["Design", "Créativité", "Histoire de l'art"],
+    "Health": ["Biologie", "Anatomie", "Chimie"],
+    "Economics": ["Microéconomie", "Business", "Finance"]
+}
 
-def _ensure_models():
-    if _MODEL_CACHE.get('initialized'):
-        return
-    df = load_dataset()
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+def model_path(centre: Optional[str] = None) -> str:
+    return os.path.join(MODELS_DIR, f"recommender_{normalize_centre(centre)}.joblib")
+
+def _ensure_models(centre: Optional[str] = None) -> Dict[str, object]:
+    """
+    Modèles du centre, chargés à la demande et gardés dans le registre LRU.
+    Le modèle entraîné est sauvegardé dans models/ et réutilisé tel quel :
+    modifier le CSV ne ré-entraîne pas (voir retrain_models).
+    """
+    centre = normalize_centre(centre)
+    return REGISTRY.get(('recommender', centre), lambda: _load_models(centre))
+
+def _load_models(centre: str) -> Dict[str, object]:
+    df = load_dataset(centre)
+    fitted = _load_fitted(centre, df)
+    if fitted is None:
+        fitted = _build_models(df, centre)
+        _save_fitted(centre, fitted)
+    return _with_data(fitted, df)
+
+def retrain_models(centre: Optional[str] = None) -> Dict[str, object]:
+    """Ré-entraînement volontaire sur le CSV actuel : nouveau modèle, nouvelle version."""
+    centre = normalize_centre(centre)
+    fitted = _build_models(load_dataset(centre), centre)
+    _save_fitted(centre, fitted)
+    REGISTRY.evict(('recommender', centre))
+    REGISTRY.evict(('cube', centre))
+    return _ensure_models(centre)
+
+def _load_fitted(centre: str, df: pd.DataFrame) -> Optional[Dict[str, object]]:
+    path = model_path(centre)
+    if not os.path.exists(path):
+        return None
+    try:
+        fitted = joblib.load(path)
+    except Exception as e:
+        print("⚠️ Modèle recommandation illisible, ré-entraînement :", e)
+        return None
+    if fitted.get('sklearn_version') != sklearn.__version__:
+        print("⚠️ Modèle recommandation entraîné avec une autre version de scikit-learn, ré-entraînement")
+        return None
+    if not set(fitted['feature_columns']) <= set(df.columns):
+        print("⚠️ Colonnes du modèle recommandation absentes du CSV, ré-entraînement")
+        return None
+    return fitted
+
+def _save_fitted(centre: str, fitted: Dict[str, object]):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    joblib.dump(fitted, model_path(centre))
+
+def _with_data(fitted: Dict[str, object], df: pd.DataFrame) -> Dict[str, object]:
+    """Applique le modèle sauvegardé au CSV actuel (lignes ajoutées ou modifiées comprises)."""
+    X = df[fitted['feature_columns']].fillna(fitted['feature_medians'])
+    X_scaled = fitted['scaler'].transform(X)
+    return {
+        **fitted,
+        'df': df,
+        'X_scaled': X_scaled,
+        'clusters': fitted['kmeans'].predict(X_scaled),
+    }
+
+@profile_training('recommender._build_models')
+def _build_models(df: pd.DataFrame, centre: Optional[str] = None) -> Dict[str, object]:
     feature_candidates = [
         'math_score', 'physics_score', 'chemistry_score', 'biology_score', 'literature_score', 'english_score',
         'communication', 'teamwork', 'leadership', 'problem_solving',
@@ -139,7 +217,8 @@ def _ensure_models():
     ]
     feature_columns = [c for c in feature_candidates if c in df.columns]
     X = df[feature_columns].copy()
-    X = X.fillna(X.median(numeric_only=True))
+    medians = X.median(numeric_only=True)
+    X = X.fillna(medians)
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
     le = LabelEncoder()
@@ -153,36 +232,50 @@ def _ensure_models():
         {'name': str(feature_columns[i]), 'importance': float(importances[i])}
         for i in range(len(feature_columns))
     ], key=lambda x: x['importance'], reverse=True)
-    kmeans = KMeans(n_clusters=3, random_state=42)
+    # k fixé à 3 (un cluster par libellé), numérotés du plus faible au plus fort ;
+    # un ré-entraînement apparie les nouveaux centres aux précédents, sauf si
+    # l'ordre faible → fort n'est plus respecté (les libellés suivent la force)
+    ref_name = f"recommender_{normalize_centre(centre)}"
+    kmeans = AutoKMeans(k_candidates=[3], random_state=42, rank_by_strength=True,
+                        reference_centers=load_reference_centers(ref_name))
     kmeans.fit(X_scaled)
-    centers = kmeans.cluster_centers_.mean(axis=1)
-    order = np.argsort(centers)
-    labels_map = {}
-    labels_map[int(order[0])] = 'faible'
-    labels_map[int(order[1])] = 'moyen'
-    labels_map[int(order[2])] = 'excellent'
-    _MODEL_CACHE['initialized'] = True
-    _MODEL_CACHE['df'] = df
-    _MODEL_CACHE['feature_columns'] = feature_columns
-    _MODEL_CACHE['scaler'] = scaler
-    _MODEL_CACHE['label_encoder'] = le
-    _MODEL_CACHE['classifier'] = clf
-    _MODEL_CACHE['kmeans'] = kmeans
-    _MODEL_CACHE['X_scaled'] = X_scaled
-    _MODEL_CACHE['cluster_label_map'] = labels_map
-    _MODEL_CACHE['feature_importances'] = fi
-    _MODEL_CACHE['feature_means'] = {str(k): float(feature_means[k]) for k in feature_means.index}
+    save_reference_centers(ref_name, kmeans.cluster_centers_)
+    labels_map = label_ranks(kmeans.n_clusters, ['faible', 'moyen', 'excellent'])
+    return {
+        'model_version': uuid.uuid4().hex[:12],
+        'sklearn_version': sklearn.__version__,
+        'feature_columns': feature_columns,
+        'feature_medians': {str(k): float(medians[k]) for k in medians.index},
+        'scaler': scaler,
+        'label_encoder': le,
+        'classifier': clf,
+        'kmeans': kmeans,
+        'cluster_label_map': labels_map,
+        'feature_importances': fi,
+        'feature_means': {str(k): float(feature_means[k]) for k in feature_means.index},
+    }
+
+def top_feature_explanations(models: Dict, student_values: Dict) -> List[Dict]:
+    fi = models.get('feature_importances', [])
+    means = models.get('feature_means', {})
+    top = fi[:5]
+    return [{
+        'name': t['name'],
+        'importance': round(t['importance'] * 100, 2),
+        'student_value': float(student_values[t['name']]) if t['name'] in student_values else None,
+        'dataset_mean': means.get(t['name'])
+    } for t in top]
 
-def get_recommendation_details(profile: Dict) -> Dict:
-    _ensure_models()
-    df = _MODEL_CACHE['df']
-    feature_columns = _MODEL_CACHE['feature_columns']
-    scaler: StandardScaler = _MODEL_CACHE['scaler']
-    le: LabelEncoder = _MODEL_CACHE['label_encoder']
-    clf: RandomForestClassifier = _MODEL_CACHE['classifier']
-    kmeans: KMeans = _MODEL_CACHE['kmeans']
-    X_scaled = _MODEL_CACHE['X_scaled']
-    cluster_label_map = _MODEL_CACHE['cluster_label_map']
+def get_recommendation_details(profile: Dict, centre: Optional[str] = None) -> Dict:
+    models = _ensure_models(centre)
+    df = models['df']
+    feature_columns = models['feature_columns']
+    scaler: StandardScaler = models['scaler']
+    le: LabelEncoder = models['label_encoder']
+    clf: RandomForestClassifier = models['classifier']
+    kmeans: AutoKMeans = models['kmeans']
+    X_scaled = models['X_scaled']
+    cluster_label_map = models['cluster_label_map']
     row = {c: profile.get(c, np.nan) for c in feature_columns}
     for c in feature_columns:
         if pd.isna(row[c]):
@@ -200,25 +293,8 @@ def get_recommendation_details(profile: Dict) -> Dict:
     distances = np.linalg.norm(X_scaled - student_scaled[0], axis=1)
     top_indices = np.argsort(distances)[:10]
     similar_students = df.iloc[top_indices][['student_id', 'preferred_option']].fillna('').to_dict('records')
-    parcours = {
-        "Engineering": ["Math Avancé", "Physique Appliquée", "Python"],
-        "Science": ["Biologie", "Chimie", "Statistiques"],
-        "IT": ["Algorithmique", "Développement Web", "Python"],
-        "Letters": ["Littérature", "Communication", "Philosophie"],
-        "Arts": ["Design", "Créativité", "Histoire de l'art"],
-        "Health": ["Biologie", "Anatomie", "Chimie"],
-        "Economics": ["Microéconomie", "Business", "Finance"]
-    }
-    recommended_courses = parcours.get(recommended_option, ["Cours généraux"])
-    fi = _MODEL_CACHE.get('feature_importances', [])
-    means = _MODEL_CACHE.get('feature_means', {})
-    top = fi[:5]
-    explanations = [{
-        'name': t['name'],
-        'importance': round(t['importance'] * 100, 2),
-        'student_value': float(df_student.iloc[0][t['name']]) if t['name'] in df_student.columns else None,
-        'dataset_mean': means.get(t['name'])
-    } for t in top]
+    recommended_courses = PARCOURS.get(recommended_option, ["Cours généraux"])
+    explanations = top_feature_explanations(models, df_student.iloc[0].to_dict())
     return {
         'recommended_option': recommended_option,
         'recommended_courses': recommended_courses,
@@ -230,16 +306,11 @@ def get_recommendation_details(profile: Dict) -> Dict:
         }
     }
 
-def get_clustered_students() -> List[Dict]:
-    _ensure_models()
-    df = _MODEL_CACHE['df']
-    kmeans: KMeans = _MODEL_CACHE['kmeans']
-    X_scaled = _MODEL_CACHE['X_scaled']
-    cluster_label_map = _MODEL_CACHE['cluster_label_map']
-    if hasattr(kmeans, 'labels_') and len(kmeans.labels_) == len(df):
-        cluster_indices = kmeans.labels_
-    else:
-        cluster_indices = kmeans.predict(X_scaled)
+def get_clustered_students(centre: Optional[str] = None) -> List[Dict]:
+    models = _ensure_models(centre)
+    df = models['df']
+    cluster_label_map = models['cluster_label_map']
+    cluster_indices = models['clusters']
     cluster_labels = [cluster_label_map.get(int(idx), str(idx)) for idx in cluster_indices]
     cols = [
         'student_id', 'age', 'gender', 'region', 'school_type',
@@ -251,16 +322,11 @@ def get_clustered_students() -> List[Dict]:
     out['cluster'] = cluster_labels
     return out.fillna('').to_dict('records')
 
-def get_exploration_overview() -> Dict:
-    _ensure_models()
-    df = _MODEL_CACHE['df']
-    kmeans: KMeans = _MODEL_CACHE['kmeans']
-    X_scaled = _MODEL_CACHE['X_scaled']
-    cluster_label_map = _MODEL_CACHE['cluster_label_map']
-    if hasattr(kmeans, 'labels_') and len(kmeans.labels_) == len(df):
-        cluster_indices = kmeans.labels_
-    else:
-        cluster_indices = kmeans.predict(X_scaled)
+def get_exploration_overview(centre: Optional[str] = None) -> Dict:
+    models = _ensure_models(centre)
+    df = models['df']
+    cluster_label_map = models['cluster_label_map']
+    cluster_indices = models['clusters']
     cluster_labels = [cluster_label_map.get(int(idx), str(idx)) for idx in cluster_indices]
     option_counts = (
         df['preferred_option'].fillna('Unknown').value_counts().reset_index().rename(columns={'index': 'preferred_option', 'preferred_option': 'count'})
@@ -0,0 +1,157 @@
+# backend/registry.py
+"""
+Registre de modèles multi-centres.
+
+Chaque centre de formation a son propre CSV et donc ses propres modèles.
+Le registre les charge à la demande (lazy), garde les plus utilisés en
+mémoire et évince les moins récemment utilisés (LRU) dès que le budget
+mémoire est dépassé. Un verrou par clé garantit que deux premières
+requêtes simultanées n'entraînent pas deux fois les mêmes modèles ; il
+n'existe que pendant un chargement ou tant que la clé est en mémoire
+(un centre inconnu ne laisse rien derrière lui).
+
+Budget configurable via MODEL_REGISTRY_MAX_MB (défaut : 1024).
+"""
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).parent
+CENTRES_DIR = Path(os.environ.get("CENTRES_DIR", BASE_DIR / "data" / "centres"))
+DEFAULT_CENTRE = "default"
+
+_CENTRE_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# temps passé par chaque thread à charger des modèles (ou à attendre qu'un
+# autre thread les charge) : permet d'écarter les requêtes « à froid »
+_local = threading.local()
+
+
+def thread_load_seconds() -> float:
+    """Cumul, pour le thread courant, du temps passé dans des chargements du registre."""
+    return getattr(_local, "load_seconds", 0.0)
+
+
+def normalize_centre(centre: Optional[str]) -> str:
+    if not centre:
+        return DEFAULT_CENTRE
+    centre = str(centre).strip()
+    if not _CENTRE_RE.match(centre):
+        raise ValueError(f"Identifiant de centre invalide : {centre!r}")
+    return centre
+
+
+def centre_csv_path(centre: Optional[str]) -> Optional[Path]:
+    """
+    CSV d'un centre : data/centres/<centre>.csv.
+    Retourne None pour le centre par défaut (dataset historique).
+    """
+    centre = normalize_centre(centre)
+    if centre == DEFAULT_CENTRE:
+        return None
+    path = CENTRES_DIR / f"{centre}.csv"
+    if not path.exists():
+        raise FileNotFoundError(f"Centre inconnu : {centre} ({path} introuvable)")
+    return path
+
+
+def estimate_size(obj) -> int:
+    """Estimation (en octets) de l'empreinte mémoire d'un jeu de modèles."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sum(estimate_size(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)) and all(isinstance(v, (str, int, float, dict)) for v in obj):
+        return sys.getsizeof(obj) + sum(estimate_size(v) for v in obj)
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(obj)
+
+
+class ModelRegistry:
+    """Cache LRU thread-safe de jeux de modèles, avec budget mémoire."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], dict]) -> dict:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        t0 = time.perf_counter()
+        try:
+            return self._load(key, key_lock, loader)
+        except BaseException:
+            # chargement échoué (centre inconnu…) : pas de verrou orphelin
+            with self._lock:
+                if key not in self._entries and self._key_locks.get(key) is key_lock:
+                    del self._key_locks[key]
+            raise
+        finally:
+            _local.load_seconds = thread_load_seconds() + time.perf_counter() - t0
+
+    def _load(self, key: Hashable, key_lock: threading.Lock, loader: Callable[[], dict]) -> dict:
+        with key_lock:
+            # un autre thread a pu charger la clé pendant l'attente
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+
+            value = loader()
+            size = estimate_size(value)
+
+            with self._lock:
+                self._entries[key] = (value, size)
+                self._evict(keep=key)
+        return value
+
+    def _evict(self, keep: Hashable):
+        total = sum(size for _, size in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key)[1]
+            self._key_locks.pop(key, None)
+            print(f"♻️ Registre : modèles {key} évincés")
+
+    def evict(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._key_locks.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_mb": round(self.max_bytes / 1e6, 1),
+                "used_mb": round(sum(s for _, s in self._entries.values()) / 1e6, 1),
+                "entries": [
+                    {"key": list(k) if isinstance(k, tuple) else k, "mb": round(s / 1e6, 2)}
+                    for k, (_, s) in self._entries.items()
+                ],
+            }
+
+
+REGISTRY = ModelRegistry(int(float(os.environ.get("MODEL_REGISTRY_MAX_MB", 1024)) * 1e6))